@@ -1,112 +1,711 @@
 """
-Opero TTS Server - Text-to-Speech using pyttsx3
+Opero TTS Server - Text-to-Speech using Piper (pyttsx3 fallback)
 Free, offline TTS for voice feedback
 """
 
 import asyncio
 import base64
+import hashlib
 import io
+import json
 import os
+import re
+import struct
+import sys
 import tempfile
+import threading
+import wave
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from contextlib import asynccontextmanager
-from threading import Lock
-from typing import Optional
+from functools import lru_cache
+from typing import Annotated, AsyncIterator, Literal, Optional
 
+import av
+import msgspec
+import orjson
 import pyttsx3
-from fastapi import FastAPI, HTTPException
+from fastapi import BackgroundTasks, Depends, FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
-from pydantic import BaseModel
+from fastapi.responses import Response, StreamingResponse
+from piper import PiperVoice, SynthesisConfig
+
+DEFAULT_RATE = 175  # Words per minute
+DEFAULT_SAMPLE_RATE = 22050  # Until pyttsx3 tells us otherwise
+FIRST_CHUNK_MS = 20  # Flush a short first chunk so playback starts immediately
+WARM_UP_TEXT = "Ready."
+CACHE_DIR = os.path.join(tempfile.gettempdir(), "opero_tts_cache")
+CACHE_MEMORY_ENTRIES = 256
+CACHE_MEMORY_BYTES = 32 * 1024 * 1024  # A long WAV prompt alone can be over 10 MB
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+HTTP_CACHE_CONTROL = "private, max-age=86400"
+# pyttsx3 can only render to a file: keep those files on tmpfs where there is one
+SCRATCH_DIR = os.environ.get("TTS_SCRATCH_DIR") or ('/dev/shm' if os.path.isdir('/dev/shm') else None)
+BASE64_BLOCK = 57_000  # Multiple of 3, so blocks encode independently without padding
+OPUS_BITRATE = 24000
+OPUS_SAMPLE_RATE = 48000  # libopus only encodes at 8/12/16/24/48 kHz
+OGG_PAGE_DURATION_US = 100_000  # Flush Ogg pages often enough to stream
+
+AudioFormat = Literal['opus', 'wav']
+MEDIA_TYPES = {
+    'opus': 'audio/ogg;codecs=opus',
+    'wav': 'audio/wav',
+}
+
+# ============ Audio Helpers ============
+
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+|\n+')
+
+def split_sentences(text: str) -> list:
+    """Split text on sentence-ending punctuation and line breaks so each piece can stream on its own"""
+    return [s.strip() for s in SENTENCE_BOUNDARY.split(text) if s.strip()]
+
+@lru_cache(maxsize=None)
+def wav_header(sample_rate: int) -> bytes:
+    """
+    44-byte RIFF header for 16-bit mono PCM with unknown (0xFFFFFFFF) sizes,
+    so players start decoding before the full length is known.
+    Only the sample rate varies, so each header is built once and reused
+    """
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 0xFFFFFFFF, b'WAVE',
+        b'fmt ', 16, 1, 1, sample_rate, sample_rate * 2, 2, 16,
+        b'data', 0xFFFFFFFF
+    )
+
+class WavEncoder:
+    """Streams PCM as-is behind a WAV header with unknown sizes"""
+
+    def __init__(self, sample_rate: int):
+        self._header = wav_header(sample_rate)
+    
+    def encode(self, pcm: bytes) -> bytes:
+        header, self._header = self._header, b''
+        return header + pcm
+    
+    def close(self) -> bytes:
+        return b''
+
+class OpusEncoder:
+    """Incremental PCM to Ogg/Opus encoder; every call returns the newly muxed bytes"""
+
+    def __init__(self, sample_rate: int):
+        self._sample_rate = sample_rate
+        self._out = io.BytesIO()
+        self._container = av.open(
+            self._out, mode='w', format='ogg',
+            options={'page_duration': str(OGG_PAGE_DURATION_US)}
+        )
+        self._stream = self._container.add_stream('libopus', rate=OPUS_SAMPLE_RATE, layout='mono')
+        self._stream.bit_rate = OPUS_BITRATE
+        self._resampler = av.AudioResampler(format='s16', layout='mono', rate=OPUS_SAMPLE_RATE)
+    
+    def encode(self, pcm: bytes) -> bytes:
+        if pcm:
+            frame = av.AudioFrame(format='s16', layout='mono', samples=len(pcm) // 2)
+            frame.planes[0].update(pcm)
+            frame.sample_rate = self._sample_rate
+            self._mux(self._resampler.resample(frame))
+        return self._drain()
+    
+    def close(self) -> bytes:
+        self._mux(self._resampler.resample(None))
+        self._container.mux(self._stream.encode(None))
+        self._container.close()
+        return self._drain()
+    
+    def _mux(self, frames: list):
+        for frame in frames:
+            self._container.mux(self._stream.encode(frame))
+    
+    def _drain(self) -> bytes:
+        data = self._out.getvalue()
+        self._out.seek(0)
+        self._out.truncate()
+        return data
+
+ENCODERS = {
+    'opus': OpusEncoder,
+    'wav': WavEncoder,
+}
+
+def finalize_audio(fmt: AudioFormat, data: bytes) -> bytes:
+    """Fill in the real RIFF sizes once a streamed WAV is complete"""
+    if fmt != 'wav':
+        return data
+    
+    data = bytearray(data)
+    struct.pack_into('<I', data, 4, len(data) - 8)
+    struct.pack_into('<I', data, 40, len(data) - 44)
+    return bytes(data)
+
+def encode_audio(pcm: bytes, sample_rate: int, fmt: AudioFormat) -> bytes:
+    """Encode a complete utterance of int16 mono PCM"""
+    encoder = ENCODERS[fmt](sample_rate)
+    return finalize_audio(fmt, encoder.encode(pcm) + encoder.close())
+
+def read_pcm(filepath: str) -> tuple:
+    """Read a rendered speech file as (sample_rate, int16 mono PCM)"""
+    try:
+        with wave.open(filepath, 'rb') as wav:
+            if wav.getnchannels() == 1 and wav.getsampwidth() == 2:
+                return wav.getframerate(), wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError):
+        pass  # Not PCM WAV (macOS' NSSpeechSynthesizer always writes AIFF)
+    return decode_pcm(filepath)
+
+def decode_pcm(filepath: str) -> tuple:
+    """Decode any audio file to (sample_rate, int16 mono PCM) with PyAV"""
+    with av.open(filepath) as container:
+        stream = container.streams.audio[0]
+        resampler = av.AudioResampler(format='s16', layout='mono', rate=stream.rate)
+        pcm = bytearray()
+        for frame in [*container.decode(stream), None]:
+            for out in resampler.resample(frame):
+                # Planes can be padded past the last sample
+                pcm += bytes(out.planes[0])[:out.samples * 2]
+        return stream.rate, bytes(pcm)
+
+def sse_event(event: str, data: bytes) -> bytes:
+    """Format one Server-Sent Event (data must not contain newlines)"""
+    return b'event: ' + event.encode() + b'\ndata: ' + data + b'\n\n'
+
+def base64_json_body(audio: bytes, mime: str, **fields) -> bytes:
+    """
+    Build a JSON body carrying `audio` as a data URL, base64-encoding it block
+    by block into one preallocated buffer. Base64 is JSON-safe, so the
+    encoded bytes are spliced in directly instead of round-tripping via str
+    """
+    prefix = f'{{"success":true,"audio":"data:{mime};base64,'.encode()
+    suffix = ('"' + ''.join(f',"{k}":{json.dumps(v)}' for k, v in fields.items()) + '}').encode()
+    
+    buf = bytearray(len(prefix) + 4 * ((len(audio) + 2) // 3) + len(suffix))
+    buf[:len(prefix)] = prefix
+    pos = len(prefix)
+    
+    view = memoryview(audio)
+    for start in range(0, len(audio), BASE64_BLOCK):
+        encoded = base64.b64encode(view[start:start + BASE64_BLOCK])
+        buf[pos:pos + len(encoded)] = encoded
+        pos += len(encoded)
+    
+    buf[pos:] = suffix
+    return bytes(buf)
+
+def audio_etag(text: str, voice_id: Optional[str], rate: int, fmt: AudioFormat) -> str:
+    """
+    Weak ETag for the audio a request produces. Weak because the bytes differ
+    by delivery: a streamed WAV has unknown RIFF sizes, a cached one real ones
+    """
+    digest = hashlib.blake2b(f"{voice_id}|{rate}|{fmt}|{text}".encode(), digest_size=16).hexdigest()
+    return f'W/"{digest}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header (possibly a list) against an ETag"""
+    if not if_none_match:
+        return False
+    opaque = etag.removeprefix('W/')
+    return any(tag.strip().removeprefix('W/') in (opaque, '*') for tag in if_none_match.split(','))
+
+# ============ Audio Cache ============
+
+class AudioCache:
+    """
+    Two-tier cache of finished audio keyed by (text, voice, rate, format):
+    an in-memory LRU of bytes in front of a directory of <sha1>.<format> files.
+    The cache is only an optimization: disk errors are logged and treated as misses
+    """
+
+    def __init__(self, directory: str, max_entries: int = CACHE_MEMORY_ENTRIES,
+                 max_bytes: int = CACHE_MAX_BYTES, max_memory_bytes: int = CACHE_MEMORY_BYTES):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_memory_bytes = max_memory_bytes
+        self._memory: OrderedDict = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes: Optional[int] = None  # Estimated directory size, unknown until first prune
+    
+    @staticmethod
+    def key(text: str, voice_id: Optional[str], rate: int, fmt: AudioFormat) -> str:
+        return f"{hashlib.sha1(f'{voice_id}|{rate}|{text}'.encode()).hexdigest()}.{fmt}"
+    
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+    
+    def get(self, key: str) -> Optional[bytes]:
+        """Look up the in-memory tier only"""
+        data = self._memory.get(key)
+        if data is not None:
+            self._memory.move_to_end(key)
+        return data
+    
+    async def load(self, key: str) -> Optional[bytes]:
+        """Look up memory, then disk (promoting disk hits into memory)"""
+        data = self.get(key)
+        if data is None and os.path.exists(self.path(key)):
+            loop = asyncio.get_running_loop()
+            try:
+                data = await loop.run_in_executor(None, self._read, key)
+            except FileNotFoundError:
+                return None  # Pruned since the exists() check
+            except OSError as e:
+                print(f"[TTS] Cache read failed: {e}")
+                return None
+            self._remember(key, data)
+        return data
+    
+    async def put(self, key: str, data: bytes):
+        self._remember(key, data)
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, self._write, key, data)
+        except OSError as e:
+            print(f"[TTS] Cache write failed: {e}")
+    
+    def _remember(self, key: str, data: bytes):
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= len(old)
+        if len(data) > self.max_memory_bytes:
+            return  # Disk only, rather than evicting everything else
+        
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while len(self._memory) > self.max_entries or self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+    
+    def _read(self, key: str) -> bytes:
+        with open(self.path(key), 'rb') as f:
+            return f.read()
+    
+    def touch(self, key: str):
+        """Mark a cached file as recently used, so prune() evicts it last"""
+        try:
+            os.utime(self.path(key))
+        except OSError:
+            pass  # Only in memory, or already pruned
+    
+    def prune(self):
+        """Delete the least recently used files once the disk tier grows past max_bytes"""
+        if self._disk_bytes is not None and self._disk_bytes <= self.max_bytes:
+            return
+        
+        try:
+            entries = [e for e in os.scandir(self.directory) if e.is_file()]
+        except FileNotFoundError:
+            return
+        
+        files = []
+        for entry in entries:
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue  # Removed by another worker's prune
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+        files.sort()
+        
+        total = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass  # Still being served (Windows) or already gone
+        
+        self._disk_bytes = total
+    
+    def _write(self, key: str, data: bytes):
+        # Write beside the target and rename, so readers never see a partial file
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self.path(key))
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        
+        if self._disk_bytes is not None:
+            self._disk_bytes += len(data)
+
+# ============ Piper Worker Pool ============
+
+async def map_unordered(fn, items: list) -> AsyncIterator[tuple]:
+    """Await fn(item) for every item concurrently, yielding (index, result) as each one finishes"""
+    async def run(index: int, item) -> tuple:
+        return index, await fn(item)
+    
+    tasks = [asyncio.ensure_future(run(i, item)) for i, item in enumerate(items)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Drop queued work if the consumer goes away (e.g. client disconnect)
+        for task in tasks:
+            task.cancel()
+
+def default_workers() -> int:
+    """Half the cores, shared between the uvicorn worker processes"""
+    server_workers = int(os.environ.get("TTS_WORKERS", 1))
+    return max(1, (os.cpu_count() or 2) // 2 // server_workers)
+
+# Voice loaded once per worker process by the pool initializer
+_worker_voice: Optional[PiperVoice] = None
+
+def _load_voice(model_path: str):
+    """Load the Piper voice model (runs once in each worker process)"""
+    global _worker_voice
+    _worker_voice = PiperVoice.load(model_path)
+    
+    # Throwaway inference so ONNX Runtime is warm before the first real request
+    for _ in _worker_voice.synthesize(WARM_UP_TEXT):
+        pass
+
+def _synthesize(text: str, length_scale: float) -> bytes:
+    """Synthesize text to raw int16 PCM (runs in a worker process)"""
+    buffer = io.BytesIO()
+    for chunk in _worker_voice.synthesize(text, SynthesisConfig(length_scale=length_scale)):
+        buffer.write(chunk.audio_int16_bytes)
+    return buffer.getvalue()
+
+class PiperWorkerPool:
+    """Process pool where every worker holds its own preloaded Piper voice"""
+
+    def __init__(self, model_path: str, workers: Optional[int] = None):
+        self.model_path = model_path
+        self.workers = workers or default_workers()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        
+        # Read the voice config in the parent so we know the output format
+        with open(f"{model_path}.json", encoding="utf-8") as f:
+            self.config = json.load(f)
+        self.sample_rate: int = self.config["audio"]["sample_rate"]
+    
+    def start(self):
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_load_voice,
+            initargs=(self.model_path,)
+        )
+    
+    async def synthesize(self, text: str, length_scale: float = 1.0) -> bytes:
+        """Synthesize text on a worker, returns raw int16 mono PCM"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, _synthesize, text, length_scale)
+    
+    async def warm_up(self):
+        """Spawn every worker now instead of on the first requests that need them"""
+        await asyncio.gather(*(self.synthesize(WARM_UP_TEXT) for _ in range(self.workers)))
+    
+    def map_unordered(self, texts: list, length_scale: float = 1.0) -> AsyncIterator[tuple]:
+        """Synthesize all texts in parallel, yielding (index, pcm) as each one finishes"""
+        return map_unordered(lambda text: self.synthesize(text, length_scale), texts)
+    
+    def shutdown(self):
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
 
 # ============ TTS Engine ============
 
-# Thread-safe TTS engine wrapper
+# TTS engine wrapper: Piper worker pool when PIPER_MODEL is set, pyttsx3 otherwise.
+# pyttsx3 always renders off the event loop, and engines are never shared between
+# threads. SAPI (Windows) voices are safe one-per-thread, so there synthesis runs
+# on a pool of threads that each lazily create their own engine; espeak and
+# NSSpeechSynthesizer are process-global, so elsewhere a single thread renders
+# with the engine created at startup.
 class TTSEngine:
     def __init__(self):
         self._engine: Optional[pyttsx3.Engine] = None
-        self._lock = Lock()
+        self._pool: Optional[PiperWorkerPool] = None
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._thread_count = 0
+        self._local = threading.local()  # Per-thread pyttsx3 engine and its applied properties
+        # Replaced wholesale (never mutated) so readers get a consistent snapshot without locking
+        self._settings = {'voice': None, 'rate': DEFAULT_RATE}
+        self._sample_rate = DEFAULT_SAMPLE_RATE
+        self._voices: tuple = ()
+        self._voice_ids: frozenset = frozenset()
+        self._voices_json = b'[]'
         self._initialized = False
+    
+    @property
+    def name(self) -> str:
+        return "piper" if self._pool else "pyttsx3"
+    
+    @property
+    def settings(self) -> dict:
+        """Current voice/rate snapshot; take it once per request and pass it along"""
+        return self._settings
+    
+    @property
+    def sample_rate(self) -> int:
+        return self._pool.sample_rate if self._pool else self._sample_rate
         
     def initialize(self):
         """Initialize the TTS engine (must be called from main thread)"""
         if not self._initialized:
-            self._engine = pyttsx3.init()
-            # Configure voice properties
-            self._engine.setProperty('rate', 175)  # Words per minute
-            self._engine.setProperty('volume', 0.9)
+            model_path = os.environ.get("PIPER_MODEL")
+            if model_path:
+                # Each worker process loads the voice model once at startup
+                workers = int(os.environ.get("PIPER_WORKERS", 0)) or None
+                self._pool = PiperWorkerPool(model_path, workers)
+                self._pool.start()
+                
+                # A Piper model is a single voice
+                name = os.path.splitext(os.path.basename(model_path))[0]
+                self._settings = {**self._settings, 'voice': name}
+                language = self._pool.config.get('language', {}).get('code')
+                voices = [{
+                    'id': name,
+                    'name': name,
+                    'languages': [language] if language else [],
+                    'gender': 'female' if 'female' in name.lower() else 'male'
+                }]
+                print(f"[TTS] Piper pool started with {self._pool.workers} workers ({model_path})")
+            else:
+                self._engine = pyttsx3.init()
+                # Configure voice properties
+                self._engine.setProperty('rate', DEFAULT_RATE)
+                self._engine.setProperty('volume', 0.9)
+                
+                # Try to set a natural-sounding voice
+                engine_voices = self._engine.getProperty('voices')
+                for voice in engine_voices:
+                    # Prefer female voice for natural sound
+                    if 'female' in voice.name.lower() or 'zira' in voice.name.lower():
+                        self._engine.setProperty('voice', voice.id)
+                        break
+                self._settings = {**self._settings, 'voice': self._engine.getProperty('voice')}
+                
+                if sys.platform == 'win32':
+                    self._thread_count = int(os.environ.get("PYTTSX3_THREADS", 0)) or default_workers()
+                    self._threads = ThreadPoolExecutor(max_workers=self._thread_count, thread_name_prefix='pyttsx3')
+                else:
+                    # The one render thread takes over the startup engine
+                    self._thread_count = 1
+                    self._threads = ThreadPoolExecutor(
+                        max_workers=1,
+                        thread_name_prefix='pyttsx3',
+                        initializer=self._adopt_engine,
+                        initargs=(self._engine, dict(self._settings))
+                    )
+                
+                voices = [
+                    {
+                        'id': v.id,
+                        'name': v.name,
+                        # espeak reports languages as bytes
+                        'languages': [l.decode(errors='ignore') if isinstance(l, bytes) else l for l in v.languages],
+                        'gender': 'female' if 'female' in v.name.lower() else 'male'
+                    }
+                    for v in engine_voices
+                ]
+                print(f"[TTS] Engine initialized with {len(voices)} available voices")
             
-            # Try to set a natural-sounding voice
-            voices = self._engine.getProperty('voices')
-            for voice in voices:
-                # Prefer female voice for natural sound
-                if 'female' in voice.name.lower() or 'zira' in voice.name.lower():
-                    self._engine.setProperty('voice', voice.id)
-                    break
+            # Build the streaming WAV header up front (pyttsx3 may refine the rate later)
+            wav_header(self.sample_rate)
             
+            # The voice list never changes at runtime: build it once, serve it lock-free
+            self._voices = tuple(voices)
+            self._voice_ids = frozenset(v['id'] for v in voices)
+            self._voices_json = orjson.dumps(self._voices)
             self._initialized = True
-            print(f"[TTS] Engine initialized with {len(voices)} available voices")
     
-    def speak_to_file(self, text: str) -> str:
+    def shutdown(self):
+        if self._pool:
+            self._pool.shutdown()
+        if self._threads:
+            self._threads.shutdown(wait=False, cancel_futures=True)
+    
+    async def warm_up(self):
+        """Run a throwaway synthesis so the first real request hits a warm engine"""
+        if self._pool:
+            await self._pool.warm_up()
+        elif self._threads:
+            # Concurrent jobs spread over the threads, creating each one's engine now.
+            # Also tells us pyttsx3's real output sample rate
+            await asyncio.gather(*(self.synthesize(WARM_UP_TEXT) for _ in range(self._thread_count)))
+    
+    async def synthesize(self, text: str, settings: Optional[dict] = None) -> bytes:
+        """Synthesize text to raw int16 mono PCM at `sample_rate`"""
+        assert self._initialized, "TTSEngine.initialize() must run at startup"
+        settings = settings or self._settings
+        if self._pool:
+            return await self._pool.synthesize(text, DEFAULT_RATE / settings['rate'])
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._threads, self._render, text, settings)
+    
+    async def synthesize_sentences(self, sentences: list, settings: Optional[dict] = None) -> AsyncIterator[tuple]:
         """
-        Speak text and save to temporary file
-        Returns the file path
+        Synthesize each sentence to PCM, yielding (index, pcm) in completion
+        order. Piper and Windows pyttsx3 render them in parallel; with a single
+        pyttsx3 thread they queue up and go one at a time
         """
-        with self._lock:
-            if not self._engine:
-                self.initialize()
-            
-            # Create temp file
-            fd, filepath = tempfile.mkstemp(suffix='.wav')
-            os.close(fd)
+        settings = settings or self._settings
+        if self._pool:
+            async for item in self._pool.map_unordered(sentences, DEFAULT_RATE / settings['rate']):
+                yield item
+        else:
+            async for item in map_unordered(lambda sentence: self.synthesize(sentence, settings), sentences):
+                yield item
+    
+    async def synthesize_in_order(self, sentences: list, settings: Optional[dict] = None) -> AsyncIterator[bytes]:
+        """Yield each sentence's PCM in sentence order, holding back any that finish early"""
+        results = self.synthesize_sentences(sentences, settings)
+        finished_early = {}
+        next_index = 0
+        try:
+            async for index, pcm in results:
+                finished_early[index] = pcm
+                while next_index in finished_early:
+                    yield finished_early.pop(next_index)
+                    next_index += 1
+        finally:
+            # Cancels outstanding Piper work if our consumer stops early
+            await results.aclose()
+    
+    def _render(self, text: str, settings: dict) -> bytes:
+        """Synthesize with this thread's pyttsx3 engine, returns raw PCM"""
+        filepath = self._to_file(text, settings)
+        try:
+            self._sample_rate, pcm = read_pcm(filepath)
+            return pcm
+        finally:
+            os.remove(filepath)
+    
+    def _adopt_engine(self, engine: pyttsx3.Engine, applied: dict):
+        """Thread initializer: hand an existing engine (and its properties) to this thread"""
+        self._local.engine = engine
+        self._local.applied = applied
+    
+    def _thread_engine(self) -> pyttsx3.Engine:
+        """This thread's pyttsx3 engine, created on first use"""
+        if getattr(self._local, 'engine', None) is None:
+            if sys.platform == 'win32':
+                import comtypes
+                comtypes.CoInitialize()  # COM must be initialized on every thread that uses SAPI
+            # pyttsx3.init() would hand back the shared instance
+            self._local.engine = pyttsx3.Engine()
+            self._local.engine.setProperty('volume', 0.9)
+            self._local.applied = {}
+        return self._local.engine
+    
+    def _to_file(self, text: str, settings: dict) -> str:
+        """pyttsx3 has no in-memory API, so render into a scratch file"""
+        engine = self._thread_engine()
+        
+        # Create temp file (NSSpeechSynthesizer writes AIFF whatever the extension)
+        suffix = '.aiff' if sys.platform == 'darwin' else '.wav'
+        fd, filepath = tempfile.mkstemp(suffix=suffix, dir=SCRATCH_DIR)
+        os.close(fd)
+        
+        try:
+            # Apply only the properties that differ from what this engine
+            # already has (each write is a COM round-trip on SAPI)
+            for name, value in settings.items():
+                if self._local.applied.get(name) != value:
+                    engine.setProperty(name, value)
+            self._local.applied = settings
             
             # Save speech to file
-            self._engine.save_to_file(text, filepath)
-            self._engine.runAndWait()
-            
-            return filepath
+            engine.save_to_file(text, filepath)
+            engine.runAndWait()
+        except BaseException:
+            # The caller never gets the path, so it can't clean up
+            os.remove(filepath)
+            raise
+        
+        return filepath
     
-    def get_voices(self) -> list:
-        """Get available voices"""
-        with self._lock:
-            if not self._engine:
-                self.initialize()
-            
-            voices = self._engine.getProperty('voices')
-            return [
-                {
-                    'id': v.id,
-                    'name': v.name,
-                    'languages': v.languages,
-                    'gender': 'female' if 'female' in v.name.lower() else 'male'
-                }
-                for v in voices
-            ]
+    def get_voices(self) -> tuple:
+        """Get available voices (precomputed at startup)"""
+        return self._voices
+    
+    @property
+    def voices_json(self) -> bytes:
+        """Available voices, pre-serialized as a JSON array"""
+        return self._voices_json
+    
+    def check_settings(self, voice_id: Optional[str] = None, rate: Optional[int] = None):
+        """
+        Raise ValueError for a voice or rate synthesis can't use. Settings are
+        only applied at synthesis time, so they must be checked before storing
+        """
+        if voice_id and voice_id not in self._voice_ids:
+            raise ValueError(f"Unknown voice: {voice_id}")
+        if rate is not None and rate <= 0:
+            raise ValueError("Rate must be a positive number of words per minute")
     
     def set_voice(self, voice_id: str):
-        """Set the voice by ID"""
-        with self._lock:
-            if self._engine:
-                self._engine.setProperty('voice', voice_id)
+        """Set the voice by ID (applied at the next synthesis)"""
+        self.check_settings(voice_id=voice_id)
+        if self._pool or voice_id == self._settings['voice']:
+            return
+        self._settings = {**self._settings, 'voice': voice_id}
     
     def set_rate(self, rate: int):
-        """Set speech rate (words per minute)"""
-        with self._lock:
-            if self._engine:
-                self._engine.setProperty('rate', rate)
+        """Set speech rate in words per minute (applied at the next synthesis)"""
+        self.check_settings(rate=rate)
+        if rate == self._settings['rate']:
+            return
+        self._settings = {**self._settings, 'rate': rate}
 
 # Global TTS engine
 tts_engine = TTSEngine()
 
+# Global synthesized-audio cache
+audio_cache = AudioCache(CACHE_DIR)
+
 # ============ API Models ============
 
-class SpeakRequest(BaseModel):
+Rate = Annotated[int, msgspec.Meta(gt=0)]  # Words per minute
+
+class SpeakRequest(msgspec.Struct):
     text: str
     voice_id: Optional[str] = None
-    rate: Optional[int] = None
+    rate: Optional[Rate] = None
+    format: AudioFormat = 'opus'
 
-class VoiceConfig(BaseModel):
+class VoiceConfig(msgspec.Struct):
     voice_id: Optional[str] = None
-    rate: Optional[int] = None
+    rate: Optional[Rate] = None
+
+def json_body(model: type):
+    """
+    Dependency that decodes and validates the JSON body straight into a
+    msgspec Struct, skipping FastAPI's Pydantic request-model layer
+    """
+    decoder = msgspec.json.Decoder(model)
+    
+    async def decode(request: Request):
+        try:
+            return decoder.decode(await request.body())
+        except msgspec.DecodeError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+    
+    return decode
+
+def apply_settings(voice_id: Optional[str], rate: Optional[int]):
+    """Apply a request's optional voice/rate, rejecting unusable values with a 400"""
+    try:
+        # Check both first, so a bad rate doesn't leave a new voice half-applied
+        tts_engine.check_settings(voice_id, rate)
+        if voice_id:
+            tts_engine.set_voice(voice_id)
+        if rate:
+            tts_engine.set_rate(rate)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 # ============ FastAPI App ============
 
@@ -114,14 +713,19 @@ class VoiceConfig(BaseModel):
 async def lifespan(app: FastAPI):
     # Initialize TTS on startup
     tts_engine.initialize()
+    try:
+        await tts_engine.warm_up()
+    except Exception as e:
+        print(f"[TTS] Warm-up failed: {e}")
     print("[TTS] Server ready")
     yield
     # Cleanup on shutdown
+    tts_engine.shutdown()
     print("[TTS] Server shutting down")
 
 app = FastAPI(
     title="Opero TTS Server",
-    description="Text-to-Speech service using pyttsx3",
+    description="Text-to-Speech service using Piper (pyttsx3 fallback)",
     version="1.0.0",
     lifespan=lifespan
 )
@@ -133,30 +737,39 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Cache"],
 )
 
 # ============ API Endpoints ============
 
+def json_response(content: dict) -> Response:
+    """Serialize with orjson straight into the response, skipping FastAPI's encoder"""
+    return Response(orjson.dumps(content), media_type="application/json")
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
-    return {"status": "ok", "service": "Opero TTS Server"}
+    return json_response({"status": "ok", "service": "Opero TTS Server"})
 
 @app.get("/status")
 async def status():
     """Get server status and available voices"""
     voices = tts_engine.get_voices()
-    return {
+    return json_response({
         "status": "ok",
-        "engine": "pyttsx3",
+        "engine": tts_engine.name,
         "voices_available": len(voices),
         "voices": voices[:5]  # Return first 5 voices
-    }
+    })
 
 @app.post("/speak")
-async def speak(request: SpeakRequest):
+async def speak(
+    http_request: Request,
+    background_tasks: BackgroundTasks,
+    request: SpeakRequest = Depends(json_body(SpeakRequest))
+):
     """
-    Convert text to speech and return audio file
+    Convert text to speech and stream it back (Ogg/Opus or WAV), sentence by sentence
     """
     if not request.text or len(request.text.strip()) == 0:
         raise HTTPException(status_code=400, detail="Text is required")
@@ -164,30 +777,91 @@ async def speak(request: SpeakRequest):
     if len(request.text) > 5000:
         raise HTTPException(status_code=400, detail="Text too long (max 5000 chars)")
     
-    try:
-        # Apply optional settings
-        if request.voice_id:
-            tts_engine.set_voice(request.voice_id)
-        if request.rate:
-            tts_engine.set_rate(request.rate)
-        
-        # Generate speech
-        filepath = tts_engine.speak_to_file(request.text)
-        
-        # Return audio file
-        return FileResponse(
-            filepath,
-            media_type="audio/wav",
-            filename="speech.wav",
-            background=None  # Don't delete file immediately
+    # Apply optional settings
+    apply_settings(request.voice_id, request.rate)
+    
+    # One settings snapshot drives both the cache key and the synthesis
+    settings = tts_engine.settings
+    media_type = MEDIA_TYPES[request.format]
+    
+    # Clients that already hold this audio get a 304 with no synthesis or transfer
+    etag = audio_etag(request.text, settings['voice'], settings['rate'], request.format)
+    cache_headers = {"ETag": etag, "Cache-Control": HTTP_CACHE_CONTROL}
+    if etag_matches(http_request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=cache_headers)
+    
+    # Repeated prompts are served from cache without synthesis. Disk hits are
+    # read up front, so a concurrent prune can only turn them into a miss
+    key = audio_cache.key(request.text, settings['voice'], settings['rate'], request.format)
+    cached = await audio_cache.load(key)
+    if cached is not None:
+        background_tasks.add_task(audio_cache.touch, key)
+        return Response(
+            cached,
+            media_type=media_type,
+            headers={**cache_headers, "X-Cache": "HIT"},
+            background=background_tasks
         )
-        
+    
+    # Synthesize every sentence up front (in parallel on Piper) while earlier ones stream
+    pcm_stream = tts_engine.synthesize_in_order(split_sentences(request.text), settings)
+    
+    # Wait for the first sentence so failures still surface as a 500
+    try:
+        first = await pcm_stream.__anext__()
     except Exception as e:
+        await pcm_stream.aclose()
         print(f"[TTS] Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    
+    async def pcm_iter() -> AsyncIterator[bytes]:
+        split = tts_engine.sample_rate * 2 * FIRST_CHUNK_MS // 1000
+        yield first[:split]
+        yield first[split:]
+        
+        async for pcm in pcm_stream:
+            yield pcm
+    
+    async def audio_iter() -> AsyncIterator[bytes]:
+        loop = asyncio.get_running_loop()
+        encoder = ENCODERS[request.format](tts_engine.sample_rate)
+        chunks = []
+        try:
+            async for pcm in pcm_iter():
+                data = await loop.run_in_executor(None, encoder.encode, pcm)
+                chunks.append(data)
+                if data:
+                    yield data
+            
+            data = await loop.run_in_executor(None, encoder.close)
+            chunks.append(data)
+            yield data
+            
+            # Only complete utterances are cached
+            await audio_cache.put(key, finalize_audio(request.format, b''.join(chunks)))
+        except Exception as e:
+            # Abort the transfer: ending the body cleanly would hand the client a
+            # truncated clip under an ETag it could revalidate for a day
+            print(f"[TTS] Error: {e}")
+            raise
+        finally:
+            await pcm_stream.aclose()
+    
+    # Keep the disk cache bounded once the response has been sent
+    background_tasks.add_task(audio_cache.prune)
+    return StreamingResponse(
+        audio_iter(),
+        media_type=media_type,
+        headers={**cache_headers, "X-Cache": "MISS"},
+        background=background_tasks
+    )
 
 @app.post("/speak/base64")
-async def speak_base64(request: SpeakRequest):
+async def speak_base64(
+    http_request: Request,
+    background_tasks: BackgroundTasks,
+    request: SpeakRequest = Depends(json_body(SpeakRequest))
+):
     """
     Convert text to speech and return base64-encoded audio
     Useful for web extension that can't easily handle binary responses
@@ -198,55 +872,101 @@ async def speak_base64(request: SpeakRequest):
     if len(request.text) > 5000:
         raise HTTPException(status_code=400, detail="Text too long (max 5000 chars)")
     
+    # Apply optional settings
+    apply_settings(request.voice_id, request.rate)
+    
     try:
-        # Apply optional settings
-        if request.voice_id:
-            tts_engine.set_voice(request.voice_id)
-        if request.rate:
-            tts_engine.set_rate(request.rate)
-        
-        # Generate speech
-        filepath = tts_engine.speak_to_file(request.text)
+        settings = tts_engine.settings
+        etag = audio_etag(request.text, settings['voice'], settings['rate'], request.format)
+        cache_headers = {"ETag": etag, "Cache-Control": HTTP_CACHE_CONTROL}
+        if etag_matches(http_request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=cache_headers)
         
-        # Read file and encode as base64
-        with open(filepath, 'rb') as f:
-            audio_data = f.read()
+        key = audio_cache.key(request.text, settings['voice'], settings['rate'], request.format)
+        audio_data = await audio_cache.load(key)
         
-        # Clean up temp file
-        os.remove(filepath)
+        if audio_data is None:
+            # Generate speech, sentences in parallel
+            sentences = split_sentences(request.text)
+            pcm = b''.join([part async for part in tts_engine.synthesize_in_order(sentences, settings)])
+            loop = asyncio.get_running_loop()
+            audio_data = await loop.run_in_executor(
+                None, encode_audio, pcm, tts_engine.sample_rate, request.format
+            )
+            await audio_cache.put(key, audio_data)
+            background_tasks.add_task(audio_cache.prune)
+        else:
+            background_tasks.add_task(audio_cache.touch, key)
         
         # Return base64-encoded audio
-        audio_base64 = base64.b64encode(audio_data).decode('utf-8')
-        
-        return {
-            "success": True,
-            "audio": f"data:audio/wav;base64,{audio_base64}",
-            "text_length": len(request.text)
-        }
+        body = base64_json_body(audio_data, MEDIA_TYPES[request.format], text_length=len(request.text))
+        return Response(body, media_type="application/json", headers=cache_headers, background=background_tasks)
         
     except Exception as e:
         print(f"[TTS] Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/speak/stream")
+async def speak_stream(
+    text: str,
+    voice_id: Optional[str] = None,
+    rate: Optional[int] = None,
+    format: AudioFormat = Query('opus')
+):
+    """
+    Convert text to speech as Server-Sent Events, one base64 clip per sentence
+    GET with query parameters so browsers can consume it with EventSource
+    """
+    if not text or len(text.strip()) == 0:
+        raise HTTPException(status_code=400, detail="Text is required")
+    
+    if len(text) > 5000:
+        raise HTTPException(status_code=400, detail="Text too long (max 5000 chars)")
+    
+    # A GET must not change server-wide settings: overrides apply to this request only
+    try:
+        tts_engine.check_settings(voice_id, rate)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    overrides = {name: value for name, value in (('voice', voice_id), ('rate', rate)) if value}
+    settings = {**tts_engine.settings, **overrides}
+    sentences = split_sentences(text)
+    
+    async def events() -> AsyncIterator[bytes]:
+        loop = asyncio.get_running_loop()
+        pcm_stream = tts_engine.synthesize_in_order(sentences, settings)
+        try:
+            # Each clip is a complete file, so it can be decoded on its own
+            index = 0
+            async for pcm in pcm_stream:
+                audio = await loop.run_in_executor(
+                    None, encode_audio, pcm, tts_engine.sample_rate, format
+                )
+                yield sse_event('chunk', base64_json_body(audio, MEDIA_TYPES[format], index=index))
+                index += 1
+            
+            yield sse_event('end', orjson.dumps({"count": len(sentences)}))
+        except Exception as e:
+            print(f"[TTS] Error: {e}")
+            yield sse_event('error', orjson.dumps({"detail": str(e)}))
+        finally:
+            await pcm_stream.aclose()
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 @app.get("/voices")
 async def get_voices():
     """Get all available voices"""
-    voices = tts_engine.get_voices()
-    return {
-        "success": True,
-        "count": len(voices),
-        "voices": voices
-    }
+    count = len(tts_engine.get_voices())
+    body = b'{"success":true,"count":%d,"voices":%s}' % (count, tts_engine.voices_json)
+    return Response(body, media_type="application/json")
 
 @app.post("/configure")
-async def configure(config: VoiceConfig):
-    """Configure TTS settings"""
-    if config.voice_id:
-        tts_engine.set_voice(config.voice_id)
-    if config.rate:
-        tts_engine.set_rate(config.rate)
+async def configure(config: VoiceConfig = Depends(json_body(VoiceConfig))):
+    """Configure TTS settings (for this worker process only when TTS_WORKERS > 1)"""
+    apply_settings(config.voice_id, config.rate)
     
-    return {"success": True, "message": "Configuration updated"}
+    return json_response({"success": True, "message": "Configuration updated"})
 
 # ============ Main ============
 
@@ -256,13 +976,21 @@ if __name__ == "__main__":
     # Default port 8765 (avoid conflicts with common ports)
     port = int(os.environ.get("TTS_PORT", 8765))
     
-    print(f"[TTS] Starting server on http://localhost:{port}")
+    # Each worker process owns its own engine and settings, so /configure only
+    # reaches the worker that handles it: one worker unless asked for more.
+    # Exported so worker processes can size their Piper pools to match
+    workers = int(os.environ.get("TTS_WORKERS", 0)) or 1
+    os.environ["TTS_WORKERS"] = str(workers)
+    
+    print(f"[TTS] Starting server on http://localhost:{port} with {workers} workers")
     print("[TTS] Endpoints:")
     print("  GET  /          - Health check")
     print("  GET  /status    - Server status")
-    print("  POST /speak     - Text to speech (returns WAV file)")
+    print("  POST /speak     - Text to speech (streams Ogg/Opus or WAV audio)")
     print("  POST /speak/base64 - Text to speech (returns base64)")
+    print("  GET  /speak/stream - Text to speech (base64 per sentence over SSE)")
     print("  GET  /voices    - List available voices")
     print("  POST /configure - Configure voice settings")
     
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    # "auto" picks uvloop and httptools when installed (uvloop is unavailable on Windows)
+    uvicorn.run("app:app", host="0.0.0.0", port=port, workers=workers, loop="auto", http="auto")
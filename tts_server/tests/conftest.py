@@ -0,0 +1,44 @@
+import os
+import sys
+
+import pytest
+
+# app.py is run as a script, not installed: make it importable as `app`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+
+FAKE_VOICE = {'id': 'fake', 'name': 'fake', 'languages': ['en_US'], 'gender': 'male'}
+
+@pytest.fixture
+def engine(monkeypatch) -> app.TTSEngine:
+    """
+    Initialized TTSEngine with one voice whose synthesis is faked: 100 samples
+    of PCM per character, and a RuntimeError for any sentence containing "fail".
+    Every call's (text, settings) is recorded in engine.calls
+    """
+    engine = app.TTSEngine()
+    engine._voices = (FAKE_VOICE,)
+    engine._voice_ids = frozenset({FAKE_VOICE['id']})
+    engine._settings = {'voice': FAKE_VOICE['id'], 'rate': app.DEFAULT_RATE}
+    engine._initialized = True
+    engine.calls = []
+    
+    async def synthesize(text: str, settings: dict = None) -> bytes:
+        engine.calls.append((text, settings))
+        if 'fail' in text:
+            raise RuntimeError("synthesis failed")
+        return b'\x01\x00' * 100 * len(text)
+    
+    engine.synthesize = synthesize
+    monkeypatch.setattr(app, 'tts_engine', engine)
+    return engine
+
+@pytest.fixture
+def client(engine, tmp_path, monkeypatch):
+    """Test client for the app running on the fake engine with an empty cache"""
+    from fastapi.testclient import TestClient
+    
+    monkeypatch.setattr(app, 'audio_cache', app.AudioCache(str(tmp_path / 'cache')))
+    with TestClient(app.app) as client:
+        yield client
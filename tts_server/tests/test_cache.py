@@ -0,0 +1,95 @@
+"""AudioCache tests: memory and disk tiers, disk errors degrading to misses, and pruning"""
+
+import asyncio
+import os
+
+import app
+from app import AudioCache
+
+def test_cache_round_trip_through_disk(tmp_path):
+    cache = AudioCache(str(tmp_path))
+    key = cache.key("Hello", "voice", 175, 'opus')
+    asyncio.run(cache.put(key, b'audio'))
+
+    # A fresh instance only has the disk tier
+    fresh = AudioCache(str(tmp_path))
+    assert fresh.get(key) is None
+    assert asyncio.run(fresh.load(key)) == b'audio'
+    assert fresh.get(key) == b'audio'
+
+def test_cache_key_covers_every_input():
+    key = AudioCache.key("Hello", "voice", 175, 'opus')
+    assert key == AudioCache.key("Hello", "voice", 175, 'opus')
+    assert key != AudioCache.key("Hello!", "voice", 175, 'opus')
+    assert key != AudioCache.key("Hello", "other", 175, 'opus')
+    assert key != AudioCache.key("Hello", "voice", 200, 'opus')
+    assert key != AudioCache.key("Hello", "voice", 175, 'wav')
+
+def test_memory_tier_is_lru(tmp_path):
+    cache = AudioCache(str(tmp_path), max_entries=2)
+    for key in ('a', 'b'):
+        cache._remember(key, key.encode())
+    cache.get('a')
+    cache._remember('c', b'c')
+
+    assert cache.get('b') is None
+    assert cache.get('a') == b'a'
+    assert cache.get('c') == b'c'
+
+def test_memory_tier_is_bounded_in_bytes(tmp_path):
+    cache = AudioCache(str(tmp_path), max_memory_bytes=100)
+    for key in ('a', 'b', 'c'):
+        cache._remember(key, b'x' * 40)
+    assert cache.get('a') is None
+    assert cache._memory_bytes == 80
+
+    # Replacing an entry doesn't count it twice
+    cache._remember('c', b'y' * 40)
+    assert cache._memory_bytes == 80
+
+    # Entries over the whole budget stay on disk instead of flushing memory
+    cache._remember('huge', b'z' * 101)
+    assert cache.get('huge') is None
+    assert cache.get('b') is not None and cache.get('c') is not None
+
+def test_load_missing_is_a_miss(tmp_path):
+    cache = AudioCache(str(tmp_path / 'missing'))
+    assert asyncio.run(cache.load('nothing.opus')) is None
+
+def test_write_failure_keeps_memory_copy(tmp_path):
+    # A file where the cache directory should be makes every disk write fail
+    blocker = tmp_path / 'cache'
+    blocker.write_bytes(b'')
+    cache = AudioCache(str(blocker))
+
+    asyncio.run(cache.put('k.opus', b'audio'))
+    assert cache.get('k.opus') == b'audio'
+
+def test_prune_evicts_least_recently_used(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=2500)
+    keys = ['a.wav', 'b.wav', 'c.wav']
+    for age, key in zip((300, 200, 100), keys):
+        asyncio.run(cache.put(key, b'x' * 1000))
+        os.utime(cache.path(key), (0, 1_000_000 - age))
+
+    cache.touch('a.wav')  # Oldest write, but just used
+    cache.prune()
+
+    assert sorted(os.listdir(tmp_path)) == ['a.wav', 'c.wav']
+    assert cache._disk_bytes == 2000
+
+def test_prune_skips_files_deleted_concurrently(tmp_path, monkeypatch):
+    cache = AudioCache(str(tmp_path), max_bytes=1500)
+    for key in ('a.wav', 'b.wav', 'c.wav'):
+        asyncio.run(cache.put(key, b'x' * 1000))
+
+    # Another worker's prune removes a file between scandir() and stat()
+    scandir = os.scandir
+    def racing_scandir(path):
+        entries = list(scandir(path))
+        os.remove(cache.path('b.wav'))
+        return iter(entries)
+    monkeypatch.setattr(app.os, 'scandir', racing_scandir)
+
+    cache.prune()
+    assert len(os.listdir(tmp_path)) == 1
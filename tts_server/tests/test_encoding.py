@@ -0,0 +1,49 @@
+"""Response encoding tests: WAV/Opus output and base64 JSON bodies"""
+
+import base64
+import io
+import json
+import wave
+
+import pytest
+
+from app import BASE64_BLOCK, base64_json_body, encode_audio, finalize_audio, wav_header
+
+@pytest.mark.parametrize("size", [0, 1, 2, 3, BASE64_BLOCK - 1, BASE64_BLOCK, BASE64_BLOCK + 1, 3 * BASE64_BLOCK + 2])
+def test_base64_json_body_round_trip(size):
+    audio = bytes(i % 251 for i in range(size))
+    body = json.loads(base64_json_body(audio, 'audio/wav', text_length=5, note='"quoted"'))
+
+    assert body['success'] is True
+    assert body['text_length'] == 5
+    assert body['note'] == '"quoted"'
+    prefix = 'data:audio/wav;base64,'
+    assert body['audio'].startswith(prefix)
+    assert base64.b64decode(body['audio'][len(prefix):]) == audio
+
+def test_base64_json_body_empty_audio():
+    assert base64_json_body(b'', 'audio/wav') == b'{"success":true,"audio":"data:audio/wav;base64,"}'
+
+def test_wav_header_is_built_once_per_rate():
+    header = wav_header(16000)
+    assert len(header) == 44
+    assert header.startswith(b'RIFF\xff\xff\xff\xffWAVEfmt ')
+    assert wav_header(16000) is header
+    assert wav_header(22050) != header
+
+def test_finalize_audio_fills_in_wav_sizes():
+    pcm = b'\x01\x00' * 100
+    data = finalize_audio('wav', wav_header(22050) + pcm)
+
+    with wave.open(io.BytesIO(data), 'rb') as wav:
+        assert wav.getframerate() == 22050
+        assert wav.getnframes() == 100
+        assert wav.readframes(100) == pcm
+
+def test_finalize_audio_leaves_opus_alone():
+    assert finalize_audio('opus', b'OggS...') == b'OggS...'
+
+def test_encode_audio_opus():
+    data = encode_audio(b'\x01\x00' * 22050, 22050, 'opus')
+    assert data.startswith(b'OggS')
+    assert b'OpusHead' in data
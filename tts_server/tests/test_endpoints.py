@@ -0,0 +1,134 @@
+"""HTTP-level tests against the fake engine from conftest"""
+
+import json
+
+import pytest
+
+import app
+
+SPEAK = {"text": "Hello there. How are you?", "format": "wav"}
+
+def test_speak_is_cached(client):
+    first = client.post("/speak", json=SPEAK)
+    assert first.status_code == 200
+    assert first.headers["x-cache"] == "MISS"
+    assert first.headers["content-type"] == "audio/wav"
+
+    second = client.post("/speak", json=SPEAK)
+    assert second.status_code == 200
+    assert second.headers["x-cache"] == "HIT"
+    # Same samples; the cached copy carries the final RIFF sizes
+    assert second.content[44:] == first.content[44:]
+
+def test_speak_base64_is_cached(client):
+    first = client.post("/speak/base64", json=SPEAK)
+    second = client.post("/speak/base64", json=SPEAK)
+    assert first.status_code == second.status_code == 200
+    assert first.json()["audio"] == second.json()["audio"]
+
+def test_configure_rejects_unknown_voice(client, engine):
+    before = engine.settings
+    response = client.post("/configure", json={"voice_id": "missing"})
+    assert response.status_code == 400
+    assert engine.settings == before
+
+def test_speak_rejects_unknown_voice_without_storing_it(client, engine):
+    before = engine.settings
+    response = client.post("/speak", json={"text": "Hi", "voice_id": "missing", "rate": 200})
+    assert response.status_code == 400
+    # The valid rate isn't applied either
+    assert engine.settings == before
+
+def test_configure_updates_settings(client, engine):
+    assert client.post("/configure", json={"voice_id": "fake", "rate": 200}).status_code == 200
+    assert engine.settings == {'voice': 'fake', 'rate': 200}
+
+def test_bad_bodies_are_rejected_at_decode(client):
+    assert client.post("/speak", content=b'{"text": ').status_code == 422
+    assert client.post("/speak", json={"text": 5}).status_code == 422
+    assert client.post("/speak", json={"text": "Hi", "format": "mp3"}).status_code == 422
+    assert client.post("/speak", json={"text": "Hi", "rate": 0}).status_code == 422
+    assert client.post("/configure", json={"rate": -10}).status_code == 422
+
+def test_json_endpoints(client):
+    assert client.get("/").json() == {"status": "ok", "service": "Opero TTS Server"}
+
+    status = client.get("/status")
+    assert status.headers["content-type"] == "application/json"
+    assert status.json()["voices"] == [{'id': 'fake', 'name': 'fake', 'languages': ['en_US'], 'gender': 'male'}]
+
+    voices = client.get("/voices").json()
+    assert voices["count"] == 1
+
+def sse_events(body: str) -> list:
+    """Parse an SSE body into (event, data) pairs"""
+    events = []
+    for block in body.strip().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.split('\n'))
+        events.append((fields['event'], json.loads(fields['data'])))
+    return events
+
+def test_speak_stream_sends_one_clip_per_sentence(client):
+    response = client.get("/speak/stream", params={"text": "One. Two. Three.", "format": "wav"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = sse_events(response.text)
+    assert [event for event, _ in events] == ['chunk', 'chunk', 'chunk', 'end']
+    assert [data['index'] for _, data in events[:3]] == [0, 1, 2]
+    assert events[0][1]['audio'].startswith('data:audio/wav;base64,UklGR')
+    assert events[-1][1] == {'count': 3}
+
+def test_speak_stream_overrides_are_per_request(client, engine):
+    before = engine.settings
+    response = client.get("/speak/stream", params={"text": "One.", "voice_id": "fake", "rate": 300})
+    assert response.status_code == 200
+
+    assert engine.calls[-1][1] == {'voice': 'fake', 'rate': 300}
+    assert engine.settings == before
+
+def test_speak_stream_rejects_bad_overrides(client, engine):
+    before = engine.settings
+    assert client.get("/speak/stream", params={"text": "One.", "voice_id": "missing"}).status_code == 400
+    assert client.get("/speak/stream", params={"text": "One.", "rate": 0}).status_code == 400
+    assert engine.settings == before
+
+def test_speak_stream_reports_errors_as_events(client):
+    response = client.get("/speak/stream", params={"text": "Fine. This will fail."})
+    assert response.status_code == 200
+
+    events = sse_events(response.text)
+    assert [event for event, _ in events] == ['chunk', 'error']
+    assert events[-1][1] == {'detail': 'synthesis failed'}
+
+def test_speak_etag_and_not_modified(client):
+    miss = client.post("/speak", json=SPEAK)
+    hit = client.post("/speak", json=SPEAK)
+    etag = miss.headers["etag"]
+    # Same validator for the streamed and the cached copy, whose WAV headers differ
+    assert etag.startswith('W/"') and hit.headers["etag"] == etag
+    assert miss.headers["cache-control"] == "private, max-age=86400"
+
+    not_modified = client.post("/speak", json=SPEAK, headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b''
+    assert not_modified.headers["etag"] == etag
+
+    # Another format is another representation
+    other = client.post("/speak", json={**SPEAK, "format": "opus"}, headers={"If-None-Match": etag})
+    assert other.status_code == 200
+
+def test_speak_base64_not_modified(client):
+    etag = client.post("/speak/base64", json=SPEAK).headers["etag"]
+    response = client.post("/speak/base64", json=SPEAK, headers={"If-None-Match": f'"other", {etag}'})
+    assert response.status_code == 304
+
+def test_speak_aborts_when_a_later_sentence_fails(client, engine):
+    # Headers (with the ETag) are already sent, so the body must not end cleanly
+    text = "Fine. This will fail."
+    with pytest.raises(RuntimeError):
+        client.post("/speak", json={"text": text})
+
+    settings = engine.settings
+    key = app.audio_cache.key(text, settings['voice'], settings['rate'], 'opus')
+    assert app.audio_cache.get(key) is None
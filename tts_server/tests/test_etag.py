@@ -0,0 +1,29 @@
+"""ETag generation and If-None-Match matching"""
+
+import pytest
+
+from app import audio_etag, etag_matches
+
+def test_audio_etag_is_weak_and_covers_every_input():
+    base = audio_etag("Hello", "voice", 175, 'opus')
+    assert base.startswith('W/"') and base.endswith('"')
+    assert base == audio_etag("Hello", "voice", 175, 'opus')
+    assert base != audio_etag("Hello!", "voice", 175, 'opus')
+    assert base != audio_etag("Hello", "other", 175, 'opus')
+    assert base != audio_etag("Hello", "voice", 200, 'opus')
+    assert base != audio_etag("Hello", "voice", 175, 'wav')
+
+@pytest.mark.parametrize("header, expected", [
+    (None, False),
+    ('', False),
+    ('W/"abc"', True),
+    ('"abc"', True),
+    ('"other", W/"abc"', True),
+    ('"other","abc"', True),
+    ('*', True),
+    ('"other"', False),
+    ('abc', False),
+    ('W/"abcd"', False),
+])
+def test_etag_matches(header, expected):
+    assert etag_matches(header, 'W/"abc"') is expected
@@ -0,0 +1,97 @@
+"""
+Sentence pipeline tests: parallel synthesis finishing out of order must still
+be delivered in order, and abandoning a stream must cancel pending work
+"""
+
+import asyncio
+import os
+
+import pytest
+
+import app
+from app import TTSEngine, map_unordered, split_sentences
+
+def fake_synthesizer(delays: dict, cancelled: list = None):
+    """Async stand-in for synthesis that takes delays[text] seconds and echoes the text"""
+    async def synthesize(text: str) -> str:
+        try:
+            await asyncio.sleep(delays[text])
+        except asyncio.CancelledError:
+            if cancelled is not None:
+                cancelled.append(text)
+            raise
+        return text
+    return synthesize
+
+def fake_engine(synthesize) -> TTSEngine:
+    engine = TTSEngine()
+    engine.synthesize_sentences = lambda sentences, settings=None: map_unordered(synthesize, sentences)
+    return engine
+
+def test_split_sentences():
+    assert split_sentences("Hi there. How are you?\n\nFine!  ") == ["Hi there.", "How are you?", "Fine!"]
+    assert split_sentences("Version 1.5 is out") == ["Version 1.5 is out"]
+    assert split_sentences("  \n ") == []
+
+def test_map_unordered_yields_in_completion_order():
+    synthesize = fake_synthesizer({'a': 0.03, 'b': 0.01, 'c': 0.02})
+
+    async def collect():
+        return [item async for item in map_unordered(synthesize, ['a', 'b', 'c'])]
+
+    assert asyncio.run(collect()) == [(1, 'b'), (2, 'c'), (0, 'a')]
+
+def test_synthesize_in_order_restores_sentence_order():
+    engine = fake_engine(fake_synthesizer({'a': 0.03, 'b': 0.01, 'c': 0.02, 'd': 0}))
+
+    async def collect():
+        return [pcm async for pcm in engine.synthesize_in_order(['a', 'b', 'c', 'd'])]
+
+    assert asyncio.run(collect()) == ['a', 'b', 'c', 'd']
+
+def test_closing_early_cancels_pending_synthesis():
+    cancelled = []
+    engine = fake_engine(fake_synthesizer({'a': 0, 'b': 10, 'c': 10}, cancelled))
+
+    async def consume_one():
+        stream = engine.synthesize_in_order(['a', 'b', 'c'])
+        first = await stream.__anext__()
+        await stream.aclose()
+        await asyncio.sleep(0.01)  # Let the cancellations land
+        # Copy: asyncio.run() would cancel any leftovers itself on exit
+        return first, list(cancelled)
+
+    first, cancelled_before_exit = asyncio.run(consume_one())
+    assert first == 'a'
+    assert sorted(cancelled_before_exit) == ['b', 'c']
+
+def test_synthesis_errors_propagate():
+    async def synthesize(text: str) -> str:
+        if text == 'bad':
+            raise RuntimeError("synthesis failed")
+        return text
+
+    engine = fake_engine(synthesize)
+
+    async def collect():
+        return [pcm async for pcm in engine.synthesize_in_order(['ok', 'bad'])]
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(collect())
+
+def test_failed_render_removes_its_scratch_file(tmp_path, monkeypatch):
+    class BrokenEngine:
+        def setProperty(self, name, value):
+            pass
+        def save_to_file(self, text, path):
+            pass
+        def runAndWait(self):
+            raise RuntimeError("driver crashed")
+
+    monkeypatch.setattr(app, 'SCRATCH_DIR', str(tmp_path))
+    engine = TTSEngine()
+    engine._adopt_engine(BrokenEngine(), {})
+
+    with pytest.raises(RuntimeError):
+        engine._render("Hello", {'voice': 'v', 'rate': 175})
+    assert os.listdir(tmp_path) == []